@@ -5,11 +5,13 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+import asyncio
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -21,16 +23,40 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+def connect():
+    """Create the client for the current process (call once per worker on startup)"""
+    global _client, db
+    if _client is None and database_url and database_name:
+        _client = AsyncIOMotorClient(
+            database_url,
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=30000,
+            waitQueueTimeoutMS=2500,
+            socketTimeoutMS=10000,
+            # fail fast when no server is reachable instead of pymongo's 30s default
+            serverSelectionTimeoutMS=5000,
+            retryWrites=True,
+            # wire-protocol compression; falls back to zlib if the server lacks zstd
+            compressors="zstd,zlib",
+            zlibCompressionLevel=6,
+        )
+        db = _client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+def close():
+    """Close the client created by connect()"""
+    global _client, db
+    for task in _batch_tasks.values():
+        task.cancel()
+    _batch_tasks.clear()
+    _batch_queues.clear()
+    if _client is not None:
+        _client.close()
+    _client = None
+    db = None
 
+# Helper functions for common database operations
+def _with_timestamps(data: Union[BaseModel, dict]) -> dict:
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
@@ -39,17 +65,94 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
 
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return data_dict
+
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp and return it with its new _id"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    result = db[collection_name].insert_one(data_dict)
-    return str(result.inserted_id)
+    data_dict = _with_timestamps(data)
+    # insert_one sets data_dict["_id"] in place, so no read-back is needed
+    await db[collection_name].insert_one(data_dict)
+    return data_dict
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def create_documents(collection_name: str, items: List[Union[BaseModel, dict]]):
+    """Insert many documents with timestamps in one round-trip and return them with their _ids"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    docs = [_with_timestamps(item) for item in items]
+    if docs:
+        await db[collection_name].insert_many(docs, ordered=False)
+    return docs
+
+# Concurrent inserts into the same collection are coalesced into one insert_many,
+# flushed after BATCH_WINDOW seconds or BATCH_MAX_SIZE documents, whichever is first.
+BATCH_WINDOW = 0.005
+BATCH_MAX_SIZE = 200
+
+_batch_queues = {}
+_batch_tasks = {}
+
+async def _flush_batches(collection_name: str, queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await queue.get()]
+        deadline = loop.time() + BATCH_WINDOW
+        while len(items) < BATCH_MAX_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        errors = {}
+        try:
+            await db[collection_name].insert_many([doc for doc, _ in items], ordered=False)
+        except BulkWriteError as e:
+            errors = {err["index"]: e for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            errors = {i: e for i in range(len(items))}
+
+        for i, (doc, future) in enumerate(items):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(doc)
+
+async def create_document_batched(collection_name: str, data: Union[BaseModel, dict]):
+    """Like create_document, but shares one insert_many with concurrent callers"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    queue = _batch_queues.get(collection_name)
+    if queue is None:
+        queue = _batch_queues[collection_name] = asyncio.Queue()
+        _batch_tasks[collection_name] = asyncio.create_task(_flush_batches(collection_name, queue))
+
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((_with_timestamps(data), future))
+    return await future
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally limited to the projected fields"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=None)
+
+def find_documents(collection_name: str, filter_dict: dict = None, projection: dict = None, batch_size: int = 500):
+    """Return a cursor over matching documents for streaming with `async for`"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return db[collection_name].find(filter_dict or {}, projection, batch_size=batch_size)
@@ -0,0 +1,12 @@
+"""
+Gunicorn settings for running the API with multiple Uvicorn workers.
+
+Usage: gunicorn -c gunicorn_config.py main:app
+"""
+import os
+
+bind = "0.0.0.0:" + os.getenv("PORT", "8000")
+workers = int(os.getenv("WEB_CONCURRENCY", (2 * (os.cpu_count() or 1)) + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = 5
+worker_tmp_dir = "/dev/shm"
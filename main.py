@@ -1,16 +1,53 @@
+import asyncio
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import re
+import time
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from datetime import datetime
-import secrets
+import base64
+import hashlib
+import orjson
+from cachetools import TTLCache
 
-from database import db, create_document, get_documents
-from schemas import Tournament, Participant, Match
+import database
+from database import create_document, create_document_batched, create_documents, find_documents, get_documents
+from schemas import Tournament, Participant, Match, warm_up
 
-app = FastAPI(title="Free Fire Max Tournament API")
+logger = logging.getLogger(__name__)
+
+
+def _orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_orjson_default,
+        option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that also encodes ObjectId values from raw Mongo documents.
+
+    Returning it directly from an endpoint skips FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+app = FastAPI(title="Free Fire Max Tournament API", default_response_class=MongoJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,33 +57,143 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+async def ensure_indexes():
+    try:
+        await database.db["tournament"].create_index("share_code", unique=True, sparse=True)
+        await database.db["participant"].create_index("tournament_id")
+        await database.db["match"].create_index([("tournament_id", 1), ("status", 1)])
+        # server addresses stay in the logs, not on the public /test endpoint
+        logger.info("MongoDB topology: %s", database.db.client.topology_description.server_descriptions())
+    except PyMongoError as e:
+        logger.warning("Could not create indexes: %s", e)
+
+
+_startup_tasks = set()
+
+
+@app.on_event("startup")
+async def startup():
+    # each gunicorn worker opens its own connection pool after the fork
+    database.connect()
+    warm_up()
+    if database.db is not None:
+        # build indexes in the background so an unreachable database cannot stall boot
+        # past gunicorn's worker timeout; /test reports DB problems
+        task = asyncio.create_task(ensure_indexes())
+        _startup_tasks.add(task)
+        task.add_done_callback(_startup_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in _startup_tasks:
+        task.cancel()
+    database.close()
+
+
 # --------- Utils ---------
 
 def to_str_id(obj):
+    # the ObjectId itself is hex-encoded by MongoJSONResponse
     if isinstance(obj, dict) and obj.get("_id"):
-        obj["id"] = str(obj.pop("_id"))
+        obj["id"] = obj.pop("_id")
     return obj
 
 
 def serialize_list(items: List[dict]):
-    return [to_str_id(i) for i in items]
+    # rename in place rather than building a second list through to_str_id
+    for item in items:
+        if "_id" in item:
+            item["id"] = item.pop("_id")
+    return items
+
+
+def cached_json(request: Request, content, max_age: int = 30) -> Response:
+    """JSON response with Cache-Control and an ETag; answers 304 if the client's copy is current"""
+    body = dumps(content)
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={2 * max_age}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-def oid(id_str: str) -> ObjectId:
-    try:
-        return ObjectId(id_str)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid id")
+def wants_ndjson(request: Request) -> bool:
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def ndjson_response(cursor) -> StreamingResponse:
+    # one document per line, encoded as the cursor yields it
+    async def generate():
+        async for doc in cursor:
+            yield dumps(to_str_id(doc)) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+_HEX24 = re.compile(r"[0-9a-fA-F]{24}")
+
+
+def is_object_id(token: str) -> bool:
+    return _HEX24.fullmatch(token) is not None
+
+
+def tournament_query(token: str) -> dict:
+    # allow by id or share code
+    return {"_id": ObjectId(token)} if is_object_id(token) else {"share_code": token}
+
+
+# Share codes never change once assigned, so each worker keeps a short-lived
+# token -> tournament id map instead of querying the tournament on every call.
+_share_cache = TTLCache(maxsize=10_000, ttl=300)
+
+
+def remember_tournament(doc: dict) -> None:
+    """Seed the resolver cache from a tournament document that was already loaded"""
+    t_id = doc["_id"]
+    _share_cache[str(t_id)] = t_id
+    if doc.get("share_code"):
+        _share_cache[doc["share_code"]] = t_id
+
+
+async def resolve_tournament_id(token: str) -> ObjectId:
+    """Map a tournament id or share code to the tournament's ObjectId (404 if unknown)"""
+    t_id = _share_cache.get(token)
+    if t_id is None:
+        query = tournament_query(token)
+        t = await database.db["tournament"].find_one(query, {"_id": 1})
+        if not t:
+            raise HTTPException(status_code=404, detail="Tournament not found")
+        t_id = t["_id"]
+        _share_cache[token] = t_id
+    return t_id
+
+
+def by_tournament(t_id: ObjectId) -> dict:
+    # documents written before tournament_id was stored as an ObjectId hold the hex string
+    return {"tournament_id": {"$in": [t_id, str(t_id)]}}
 
 
 # --------- Health ---------
 @app.get("/")
-def root():
+async def root():
     return {"message": "Free Fire Max Tournament API running"}
 
 
+# Probes hit /test every few seconds; reuse the last result for HEALTH_TTL seconds.
+HEALTH_TTL = 10
+_health_cache = {"t": 0.0, "val": None}
+
+
 @app.get("/test")
-def test_database():
+async def test_database():
+    if _health_cache["val"] is not None and time.monotonic() - _health_cache["t"] < HEALTH_TTL:
+        return _health_cache["val"]
+
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -56,113 +203,143 @@ def test_database():
         "collections": [],
     }
     try:
-        if db is not None:
+        if database.db is not None:
             response["database"] = "✅ Available"
-            response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-            response["database_name"] = db.name if hasattr(db, "name") else "❌ Not Set"
+            response["database_url"] = "✅ Set" if database.database_url else "❌ Not Set"
+            response["database_name"] = database.database_name or "❌ Not Set"
             response["connection_status"] = "Connected"
             try:
-                response["collections"] = db.list_collection_names()[:10]
+                response["collections"] = (await database.db.list_collection_names())[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
                 response["database"] = f"⚠️ Connected but Error: {str(e)[:60]}"
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:60]}"
-    return response
+
+    # 503 lets orchestrators restart a worker whose database is unreachable
+    status_code = 200 if response["database"] == "✅ Connected & Working" else 503
+    result = MongoJSONResponse(response, status_code=status_code)
+    _health_cache["t"] = time.monotonic()
+    _health_cache["val"] = result
+    return result
 
 
 # --------- Tournaments ---------
+# List views only need card-level fields; full documents come from the detail endpoints.
+TOURNAMENT_LIST_FIELDS = {
+    "title": 1,
+    "status": 1,
+    "starts_at": 1,
+    "mode": 1,
+    "share_code": 1,
+    "banner_url": 1,
+    "max_participants": 1,
+}
+
+
 @app.get("/api/tournaments")
-def list_tournaments():
-    items = get_documents("tournament")
-    return serialize_list(items)
+async def list_tournaments(request: Request):
+    items = await get_documents("tournament", projection=TOURNAMENT_LIST_FIELDS)
+    return cached_json(request, serialize_list(items))
 
 
-class CreateTournamentRequest(Tournament):
-    pass
+def share_code_for(t_id: ObjectId) -> str:
+    # 8 base32 chars from the ObjectId's process-random + counter bytes
+    return base64.b32encode(t_id.binary[7:]).decode().lower()
 
 
 @app.post("/api/tournaments")
-def create_tournament(payload: CreateTournamentRequest):
-    data = payload.model_dump()
-    # generate short share code (6-8 chars)
-    data["share_code"] = data.get("share_code") or secrets.token_hex(3)
-    new_id = create_document("tournament", data)
-    doc = db["tournament"].find_one({"_id": ObjectId(new_id)})
-    return to_str_id(doc)
+async def create_tournament(payload: Tournament):
+    data = payload.model_dump(exclude_none=True)
+    custom_code = data.get("share_code")
+    for _ in range(3):
+        if not custom_code:
+            data["_id"] = ObjectId()
+            data["share_code"] = share_code_for(data["_id"])
+        try:
+            doc = await create_document("tournament", data)
+            break
+        except DuplicateKeyError:
+            if custom_code:
+                raise HTTPException(status_code=409, detail="Share code already in use")
+    else:
+        raise HTTPException(status_code=503, detail="Could not allocate a share code")
+    remember_tournament(doc)
+    return MongoJSONResponse(to_str_id(doc))
 
 
 @app.get("/api/tournaments/{tournament_id}")
-def get_tournament(tournament_id: str):
-    # allow by id or share code
-    query = {"_id": oid(tournament_id)} if len(tournament_id) == 24 else {"share_code": tournament_id}
-    doc = db["tournament"].find_one(query)
+async def get_tournament(request: Request, tournament_id: str):
+    query = tournament_query(tournament_id)
+    doc = await database.db["tournament"].find_one(query)
     if not doc:
         raise HTTPException(status_code=404, detail="Tournament not found")
-    return to_str_id(doc)
+    remember_tournament(doc)
+    return cached_json(request, to_str_id(doc))
 
 
 # --------- Participants ---------
-class RegisterRequest(Participant):
-    pass
-
-
 @app.post("/api/tournaments/{tournament_id}/register")
-def register_participant(tournament_id: str, payload: RegisterRequest):
+async def register_participant(tournament_id: str, payload: Participant):
     # Ensure tournament exists
-    t_query = {"_id": oid(tournament_id)} if len(tournament_id) == 24 else {"share_code": tournament_id}
-    t = db["tournament"].find_one(t_query)
-    if not t:
-        raise HTTPException(status_code=404, detail="Tournament not found")
+    t_id = await resolve_tournament_id(tournament_id)
+    data = payload.model_dump(exclude_none=True)
+    data["tournament_id"] = t_id
+    doc = await create_document_batched("participant", data)
+    return MongoJSONResponse(to_str_id(doc))
+
+
+class BulkRegisterRequest(BaseModel):
+    participants: List[Participant]
+
+
+@app.post("/api/tournaments/{tournament_id}/participants/bulk")
+async def register_participants_bulk(tournament_id: str, payload: BulkRegisterRequest):
+    # roster imports: one tournament check and one insert_many for the whole list
+    t_id = await resolve_tournament_id(tournament_id)
+    items = []
+    for p in payload.participants:
+        data = p.model_dump(exclude_none=True)
+        data["tournament_id"] = t_id
+        items.append(data)
+    docs = await create_documents("participant", items)
+    return {"inserted": len(docs), "ids": [str(d["_id"]) for d in docs]}
+
 
-    data = payload.model_dump()
-    data["tournament_id"] = str(t.get("_id"))
-    new_id = create_document("participant", data)
-    doc = db["participant"].find_one({"_id": ObjectId(new_id)})
-    return to_str_id(doc)
+PARTICIPANT_CONTACT_FIELDS = {"contact_email": 0, "contact_phone": 0}
 
 
 @app.get("/api/tournaments/{tournament_id}/participants")
-def list_participants(tournament_id: str):
-    t_id = tournament_id if len(tournament_id) == 24 else None
-    if not t_id:
-        # map share code to real id
-        t = db["tournament"].find_one({"share_code": tournament_id})
-        if not t:
-            raise HTTPException(status_code=404, detail="Tournament not found")
-        t_id = str(t.get("_id"))
-    items = get_documents("participant", {"tournament_id": t_id})
-    return serialize_list(items)
+async def list_participants(request: Request, tournament_id: str, include_contact: bool = False):
+    # map share code to real id
+    t_id = ObjectId(tournament_id) if is_object_id(tournament_id) else await resolve_tournament_id(tournament_id)
+    projection = None if include_contact else PARTICIPANT_CONTACT_FIELDS
+    if wants_ndjson(request):
+        return ndjson_response(find_documents("participant", by_tournament(t_id), projection=projection))
+    items = await get_documents("participant", by_tournament(t_id), projection=projection)
+    return MongoJSONResponse(serialize_list(items))
 
 
 # --------- Matches ---------
-class CreateMatchRequest(Match):
-    pass
+@app.post("/api/tournaments/{tournament_id}/matches")
+async def create_match(tournament_id: str, payload: Match):
+    t_id = await resolve_tournament_id(tournament_id)
+    data = payload.model_dump(exclude_none=True)
+    data["tournament_id"] = t_id
+    doc = await create_document_batched("match", data)
+    return MongoJSONResponse(to_str_id(doc))
 
 
-@app.post("/api/tournaments/{tournament_id}/matches")
-def create_match(tournament_id: str, payload: CreateMatchRequest):
-    t_query = {"_id": oid(tournament_id)} if len(tournament_id) == 24 else {"share_code": tournament_id}
-    t = db["tournament"].find_one(t_query)
-    if not t:
-        raise HTTPException(status_code=404, detail="Tournament not found")
-    data = payload.model_dump()
-    data["tournament_id"] = str(t.get("_id"))
-    new_id = create_document("match", data)
-    doc = db["match"].find_one({"_id": ObjectId(new_id)})
-    return to_str_id(doc)
+MATCH_LIST_EXCLUDED_FIELDS = {"result": 0, "room_password": 0}
 
 
 @app.get("/api/tournaments/{tournament_id}/matches")
-def list_matches(tournament_id: str):
-    t_id = tournament_id if len(tournament_id) == 24 else None
-    if not t_id:
-        t = db["tournament"].find_one({"share_code": tournament_id})
-        if not t:
-            raise HTTPException(status_code=404, detail="Tournament not found")
-        t_id = str(t.get("_id"))
-    items = get_documents("match", {"tournament_id": t_id})
-    return serialize_list(items)
+async def list_matches(request: Request, tournament_id: str):
+    t_id = ObjectId(tournament_id) if is_object_id(tournament_id) else await resolve_tournament_id(tournament_id)
+    if wants_ndjson(request):
+        return ndjson_response(find_documents("match", by_tournament(t_id), projection=MATCH_LIST_EXCLUDED_FIELDS))
+    items = await get_documents("match", by_tournament(t_id), projection=MATCH_LIST_EXCLUDED_FIELDS)
+    return MongoJSONResponse(serialize_list(items))
 
 
 # --------- Sharing ---------
@@ -172,25 +349,29 @@ class ShareLinkResponse(BaseModel):
 
 
 @app.get("/api/tournaments/{tournament_id}/share", response_model=ShareLinkResponse)
-def get_share_link(tournament_id: str):
-    query = {"_id": oid(tournament_id)} if len(tournament_id) == 24 else {"share_code": tournament_id}
-    t = db["tournament"].find_one(query)
+async def get_share_link(request: Request, tournament_id: str):
+    query = tournament_query(tournament_id)
+    t = await database.db["tournament"].find_one(query)
     if not t:
         raise HTTPException(status_code=404, detail="Tournament not found")
+    remember_tournament(t)
     code = t.get("share_code")
     frontend_origin = os.getenv("FRONTEND_URL", "http://localhost:3000")
-    return ShareLinkResponse(share_url=f"{frontend_origin}/?t={code}", code=code)
+    # share codes never change, so the link can be cached for long
+    link = ShareLinkResponse(share_url=f"{frontend_origin}/?t={code}", code=code)
+    return cached_json(request, link.model_dump(), max_age=3600)
 
 
 @app.get("/api/share/{code}")
-def get_by_share_code(code: str):
-    t = db["tournament"].find_one({"share_code": code})
+async def get_by_share_code(request: Request, code: str):
+    t = await database.db["tournament"].find_one({"share_code": code})
     if not t:
         raise HTTPException(status_code=404, detail="Tournament not found")
-    return to_str_id(t)
+    remember_tournament(t)
+    return cached_json(request, to_str_id(t))
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run("main:app", host="0.0.0.0", port=port)
@@ -24,7 +24,7 @@ class Tournament(BaseModel):
     share_code: Optional[str] = Field(None, description="Short share code for the tournament")
 
 class Participant(BaseModel):
-    tournament_id: str = Field(..., description="Linked tournament id")
+    tournament_id: Optional[str] = Field(None, description="Linked tournament id (set from the URL on create)")
     name: str = Field(..., description="Player or team representative name")
     ign: Optional[str] = Field(None, description="In-game name (IGN)")
     team_name: Optional[str] = Field(None, description="Team name (if Squad/Duo)")
@@ -34,7 +34,7 @@ class Participant(BaseModel):
     notes: Optional[str] = Field(None, description="Additional info")
 
 class Match(BaseModel):
-    tournament_id: str = Field(..., description="Linked tournament id")
+    tournament_id: Optional[str] = Field(None, description="Linked tournament id (set from the URL on create)")
     round_name: str = Field(..., description="Round name, e.g., Qualifiers, Finals")
     map_name: Optional[str] = Field(None, description="Map name")
     scheduled_at: Optional[datetime] = Field(None, description="Scheduled time (UTC)")
@@ -43,3 +43,10 @@ class Match(BaseModel):
     status: Literal["scheduled", "live", "completed"] = Field("scheduled")
     participants: Optional[List[str]] = Field(None, description="Participant ids/names involved")
     result: Optional[dict] = Field(None, description="Result payload with placements/kills etc.")
+
+def warm_up():
+    """Validate a minimal payload per model so a worker's first requests run warm"""
+    # validators are already compiled at class definition; this just exercises them once
+    Tournament.model_validate({"title": "warm-up"})
+    Participant.model_validate({"name": "warm-up"})
+    Match.model_validate({"round_name": "warm-up"})